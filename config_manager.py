@@ -4,7 +4,6 @@ import json
 import os
 import threading
 from llm_adapters import create_llm_adapter
-from embedding_adapters import create_embedding_adapter
 
 
 def load_config(config_file: str) -> dict:
@@ -70,6 +69,8 @@ def test_embedding_config(api_key, base_url, interface_format, model_name, log_f
     """测试当前的Embedding配置是否可用"""
     def task():
         try:
+            # embedding_adapters 会导入 langchain 等较重的模块，仅在测试时才加载
+            from embedding_adapters import create_embedding_adapter
             log_func("开始测试Embedding配置...")
             embedding_adapter = create_embedding_adapter(
                 interface_format=interface_format,
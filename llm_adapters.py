@@ -1,18 +1,62 @@
 # llm_adapters.py
 # -*- coding: utf-8 -*-
+import asyncio
+import atexit
+import functools
+import errno
+import hashlib
 import logging
-from typing import Optional
-from langchain_openai import ChatOpenAI, AzureChatOpenAI
-import google.generativeai as genai
-from azure.ai.inference import ChatCompletionsClient
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.inference.models import SystemMessage, UserMessage
-from openai import OpenAI
-import requests
+import re
+import selectors
+from typing import TYPE_CHECKING, Iterator, List, Optional
 import os
 import socket
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor
 
+if TYPE_CHECKING:
+    import httpx
+
+_AZURE_OPENAI_RE = re.compile(r'https://(.+?)/openai/deployments/(.+?)/chat/completions\?api-version=(.+)')
+_AZURE_AI_RE = re.compile(r'https://(.+?)\.services\.ai\.azure\.com(?:/models)?(?:/chat/completions)?(?:\?api-version=(.+))?')
+# 用于判断异常信息是否属于网络连接问题
+_NET_ERR_RE = re.compile(r'(connection|timeout|network|proxy|ssl|certificate)', re.I)
+
+# 常见的本地代理端口（按优先级排列）：(host, port, scheme)
+_PROXY_CANDIDATES = (
+    ("127.0.0.1", 7890, "http"),    # Clash for Windows 默认HTTP代理
+    ("127.0.0.1", 7891, "socks5"),  # Clash for Windows 默认SOCKS5代理
+    ("127.0.0.1", 8080, "http"),    # 其他常见HTTP代理
+    ("127.0.0.1", 1080, "http"),    # 其他常见代理
+)
+
+# 非阻塞 connect 尚在进行中时 connect_ex 返回的错误码（Windows 下为 WSAEWOULDBLOCK）
+_CONNECT_IN_PROGRESS = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, getattr(errno, 'WSAEWOULDBLOCK', errno.EWOULDBLOCK)}
+
+# 代理相关的环境变量（大小写两套）
+_PROXY_ENV_KEYS = ('HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy')
+
+# 代理自动检测结果缓存：None 表示尚未检测
+_PROXY_DETECTED: Optional[bool] = None
+
+# Google连通性检测结果缓存：(HTTP_PROXY, HTTPS_PROXY) -> (检测时间, 结果)
+_CONNECTIVITY_CACHE: dict[tuple, tuple[float, bool]] = {}
+_CONNECTIVITY_TTL = 60
+
+# 共享的 HTTP 客户端：(HTTP_PROXY, HTTPS_PROXY) -> httpx.Client
+_SHARED_HTTP_CLIENTS: dict[tuple, "httpx.Client"] = {}
+_SHARED_HTTP_CLIENTS_LOCK = threading.Lock()
+
+
+def _has_v_suffix(url: str) -> bool:
+    """
+    判断url是否以 /v<数字> 结尾（如 /v1、/v3）
+    """
+    if url.endswith('/v1'):
+        return True
+    tail = url.rsplit('/', 1)[-1]
+    return len(tail) >= 2 and tail[0] == 'v' and tail[1:].isdigit()
 
 def check_base_url(url: str) -> str:
     """
@@ -20,7 +64,6 @@ def check_base_url(url: str) -> str:
     1. 如果url以#结尾，则移除#并直接使用用户提供的url
     2. 否则检查是否需要添加/v1后缀
     """
-    import re
     url = url.strip()
     if not url:
         return url
@@ -28,141 +71,280 @@ def check_base_url(url: str) -> str:
     if url.endswith('#'):
         return url.rstrip('#')
         
-    if not re.search(r'/v\d+$', url):
+    if not _has_v_suffix(url):
         if '/v1' not in url:
             url = url.rstrip('/') + '/v1'
     return url
 
-def detect_and_setup_proxy():
+def _set_proxy_env(http_proxy: str, https_proxy: str):
+    """
+    一次性写入大小写两套代理环境变量（小写版本某些库需要）
+    """
+    os.environ.update({
+        'HTTP_PROXY': http_proxy,
+        'HTTPS_PROXY': https_proxy,
+        'http_proxy': http_proxy,
+        'https_proxy': https_proxy,
+    })
+
+def _probe_proxy_ports(timeout: float = 1.0) -> List[bool]:
+    """
+    用非阻塞 socket + selectors 同时探测 _PROXY_CANDIDATES 中的各个端口，
+    返回与候选列表顺序一致的结果；优先级最高的可用端口一旦确定即提前返回。
+    """
+    results = [False] * len(_PROXY_CANDIDATES)
+    pending = set()
+    sockets = []
+    selector = selectors.DefaultSelector()
+    try:
+        for index, (host, port, _) in enumerate(_PROXY_CANDIDATES):
+            try:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sockets.append(sock)
+                sock.setblocking(False)
+                err = sock.connect_ex((host, port))
+            except OSError as e:
+                logging.debug(f"检测代理 {host}:{port} 失败: {e}")
+                continue
+            if err == 0:
+                results[index] = True
+            elif err in _CONNECT_IN_PROGRESS:
+                selector.register(sock, selectors.EVENT_WRITE, index)
+                pending.add(index)
+            else:
+                logging.debug(f"检测代理 {host}:{port} 失败: errno {err}")
+
+        deadline = time.monotonic() + timeout
+        while pending:
+            # 比当前最优结果优先级更高的端口都已有结论时即可停止
+            best = next((i for i, ok in enumerate(results) if ok or i in pending), None)
+            if best is not None and results[best]:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _ in selector.select(remaining):
+                selector.unregister(key.fileobj)
+                pending.discard(key.data)
+                if key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                    results[key.data] = True
+    finally:
+        selector.close()
+        for sock in sockets:
+            sock.close()
+    return results
+
+def detect_and_setup_proxy(force: bool = False):
     """
     检测并设置代理配置，主要针对Clash等代理工具
+
+    所有候选端口并发探测，总耗时取决于最慢的一次探测而不是累加；
+    检测结果会被缓存，传入 force=True 可强制重新检测。
     """
-    # 常见的代理端口配置
-    proxy_configs = [
-        {"http": "http://127.0.0.1:7890", "https": "http://127.0.0.1:7890"},  # Clash for Windows 默认HTTP代理
-        {"http": "socks5://127.0.0.1:7891", "https": "socks5://127.0.0.1:7891"},  # Clash for Windows 默认SOCKS5代理
-        {"http": "http://127.0.0.1:8080", "https": "http://127.0.0.1:8080"},  # 其他常见HTTP代理
-        {"http": "http://127.0.0.1:1080", "https": "http://127.0.0.1:1080"},  # 其他常见代理
-    ]
-    
+    global _PROXY_DETECTED
+
     # 检查系统环境变量中是否已经设置了代理
     if os.environ.get('HTTP_PROXY') or os.environ.get('HTTPS_PROXY'):
         logging.info("系统环境变量中已配置代理")
         return True
+
+    if _PROXY_DETECTED is not None and not force:
+        return _PROXY_DETECTED
     
-    # 尝试检测可用的代理
-    for proxy_config in proxy_configs:
-        try:
-            # 解析代理地址和端口
-            import re
-            http_proxy = proxy_config["http"]
-            if "://" in http_proxy:
-                proxy_url = http_proxy.split("://")[1]
-            else:
-                proxy_url = http_proxy
-            
-            if ":" in proxy_url:
-                host, port = proxy_url.split(":")
-                port = int(port)
-                
-                # 检查端口是否开放
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.settimeout(1)
-                result = sock.connect_ex((host, port))
-                sock.close()
-                
-                if result == 0:
-                    # 端口开放，设置代理
-                    os.environ['HTTP_PROXY'] = proxy_config["http"]
-                    os.environ['HTTPS_PROXY'] = proxy_config["https"]
-                    os.environ['http_proxy'] = proxy_config["http"]  # 小写版本，某些库需要
-                    os.environ['https_proxy'] = proxy_config["https"]
-                    logging.info(f"成功检测并设置代理: {proxy_config['http']}")
-                    return True
-                    
-        except Exception as e:
-            logging.debug(f"检测代理 {proxy_config} 失败: {e}")
-            continue
+    # 并发检测所有候选代理，按优先级选取第一个可用的
+    results = _probe_proxy_ports()
+
+    for (host, port, scheme), is_open in zip(_PROXY_CANDIDATES, results):
+        if is_open:
+            # 端口开放，设置代理
+            proxy = f"{scheme}://{host}:{port}"
+            _set_proxy_env(proxy, proxy)
+            logging.info(f"成功检测并设置代理: {proxy}")
+            _PROXY_DETECTED = True
+            return True
     
     logging.warning("未检测到可用的代理配置，可能需要手动设置")
+    _PROXY_DETECTED = False
     return False
 
-def test_google_connectivity():
+def test_google_connectivity(force: bool = False):
     """
     测试能否访问Google服务
+
+    结果按当前代理环境变量缓存 60 秒，传入 force=True 可跳过缓存重新检测。
     """
+    key = (os.environ.get('HTTP_PROXY'), os.environ.get('HTTPS_PROXY'))
+    now = time.monotonic()
+    if not force:
+        cached = _CONNECTIVITY_CACHE.get(key)
+        if cached and now - cached[0] < _CONNECTIVITY_TTL:
+            return cached[1]
+
     try:
+        import urllib.error
         import urllib.request
-        # 尝试访问Google AI的endpoint
-        response = urllib.request.urlopen('https://generativelanguage.googleapis.com', timeout=10)
-        return response.getcode() == 200
+        # 只需判断能否连通Google AI的endpoint，用HEAD请求避免下载响应体
+        request = urllib.request.Request('https://generativelanguage.googleapis.com', method='HEAD')
+        with urllib.request.urlopen(request, timeout=3) as response:
+            result = 200 <= response.getcode() < 400
+    except urllib.error.HTTPError as e:
+        # 服务端已返回HTTP状态码（如404），说明网络链路是通的
+        logging.debug(f"Google连接测试返回状态码: {e.code}")
+        result = True
     except Exception as e:
         logging.debug(f"Google连接测试失败: {e}")
-        return False
+        result = False
 
-class BaseLLMAdapter:
+    _CONNECTIVITY_CACHE[key] = (now, result)
+    return result
+
+def _proxy_env_key() -> tuple:
     """
-    统一的 LLM 接口基类，为不同后端（OpenAI、Ollama、ML Studio、Gemini等）提供一致的方法签名。
+    当前代理环境变量组成的缓存键
     """
-    def invoke(self, prompt: str) -> str:
-        raise NotImplementedError("Subclasses must implement .invoke(prompt) method.")
+    return (os.environ.get('HTTP_PROXY'), os.environ.get('HTTPS_PROXY'))
 
-class DeepSeekAdapter(BaseLLMAdapter):
+def get_shared_http_client() -> "httpx.Client":
     """
-    适配官方/OpenAI兼容接口（使用 langchain.ChatOpenAI）
+    返回所有 OpenAI 兼容适配器共用的 httpx.Client，复用 keep-alive 连接与 TLS 会话。
+    httpx 只在创建客户端时读取代理环境变量，因此按当前代理设置分别缓存。
     """
-    def __init__(self, api_key: str, base_url: str, model_name: str, max_tokens: int, temperature: float = 0.7, timeout: Optional[int] = 600):
-        self.base_url = check_base_url(base_url)
-        self.api_key = api_key
-        self.model_name = model_name
-        self.max_tokens = max_tokens
-        self.temperature = temperature
-        self.timeout = timeout
+    import httpx
+
+    key = _proxy_env_key()
+    with _SHARED_HTTP_CLIENTS_LOCK:
+        client = _SHARED_HTTP_CLIENTS.get(key)
+        if client is None:
+            client = httpx.Client(
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+                timeout=httpx.Timeout(600, connect=10),
+                follow_redirects=True
+            )
+            _SHARED_HTTP_CLIENTS[key] = client
+        return client
 
-        self._client = ChatOpenAI(
-            model=self.model_name,
-            api_key=self.api_key,
-            base_url=self.base_url,
-            max_tokens=self.max_tokens,
-            temperature=self.temperature,
-            timeout=self.timeout
-        )
+def _close_shared_http_clients():
+    with _SHARED_HTTP_CLIENTS_LOCK:
+        for client in _SHARED_HTTP_CLIENTS.values():
+            client.close()
+        _SHARED_HTTP_CLIENTS.clear()
 
-    def invoke(self, prompt: str) -> str:
-        response = self._client.invoke(prompt)
-        if not response:
-            logging.warning("No response from DeepSeekAdapter.")
-            return ""
-        return response.content
+atexit.register(_close_shared_http_clients)
 
-class OpenAIAdapter(BaseLLMAdapter):
+class _SingleFlight:
     """
-    适配官方/OpenAI兼容接口（使用 langchain.ChatOpenAI）
+    合并并发的重复调用：相同 key 的调用进行中时，后到的调用直接等待并共享第一个调用的结果（或异常）。
     """
-    def __init__(self, api_key: str, base_url: str, model_name: str, max_tokens: int, temperature: float = 0.7, timeout: Optional[int] = 600):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Future] = {}
+
+    def do(self, key: str, func, *args):
+        with self._lock:
+            future = self._inflight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._inflight[key] = future
+        if not is_owner:
+            return future.result()
+
+        try:
+            result = func(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+_INVOKE_SINGLE_FLIGHT = _SingleFlight()
+
+def _iter_openai_stream(stream) -> Iterator[str]:
+    """
+    从 OpenAI SDK 的流式响应中逐段取出文本增量
+    """
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+class BaseLLMAdapter:
+    """
+    统一的 LLM 接口基类，为不同后端（OpenAI、Ollama、ML Studio、Gemini等）提供一致的方法签名。
+    子类实现 _invoke(prompt)；invoke 会合并同一适配器上并发提交的相同 prompt，只发起一次 API 请求。
+    """
+    def invoke(self, prompt: str) -> str:
+        key = hashlib.sha256(f"{id(self)}|{getattr(self, 'model_name', '')}|{prompt}".encode("utf-8")).hexdigest()
+        return _INVOKE_SINGLE_FLIGHT.do(key, self._invoke, prompt)
+
+    def _invoke(self, prompt: str) -> str:
+        raise NotImplementedError("Subclasses must implement ._invoke(prompt) method.")
+
+    def stream_invoke(self, prompt: str) -> Iterator[str]:
+        """
+        流式调用，逐段产出生成的文本；默认一次性产出 invoke 的完整结果，支持流式输出的子类会覆盖此方法。
+        """
+        yield self.invoke(prompt)
+
+    async def ainvoke(self, prompt: str) -> str:
+        """
+        异步调用；在线程池中执行 invoke。
+        不使用 SDK 的原生异步客户端：其连接池绑定创建时的事件循环，而适配器会被缓存并跨事件循环复用。
+        """
+        return await asyncio.to_thread(self.invoke, prompt)
+
+    def invoke_many(self, prompts: List[str], max_concurrency: int = 8) -> List[str]:
+        """
+        并发调用多个 prompt，最多同时进行 max_concurrency 个请求，返回结果与 prompts 顺序一致。
+        """
+        if not prompts:
+            return []
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(prompts))) as executor:
+            return list(executor.map(self.invoke, prompts))
+
+class ChatOpenAICompatibleAdapter(BaseLLMAdapter):
+    """
+    适配官方/OpenAI兼容接口（使用 langchain.ChatOpenAI），
+    DeepSeek、OpenAI、Ollama、ML Studio、阿里云百炼等均通过 name 区分。
+    """
+    def __init__(self, api_key: str, base_url: str, model_name: str, max_tokens: int, temperature: float = 0.7, timeout: Optional[int] = 600,
+                 name: str = "OpenAIAdapter", default_api_key: Optional[str] = None):
+        self.name = name
         self.base_url = check_base_url(base_url)
         self.api_key = api_key
+        if not self.api_key and default_api_key:
+            self.api_key = default_api_key
         self.model_name = model_name
         self.max_tokens = max_tokens
         self.temperature = temperature
         self.timeout = timeout
 
+        from langchain_openai import ChatOpenAI
         self._client = ChatOpenAI(
             model=self.model_name,
             api_key=self.api_key,
             base_url=self.base_url,
             max_tokens=self.max_tokens,
             temperature=self.temperature,
-            timeout=self.timeout
+            timeout=self.timeout,
+            http_client=get_shared_http_client()
         )
 
-    def invoke(self, prompt: str) -> str:
+    def _invoke(self, prompt: str) -> str:
         response = self._client.invoke(prompt)
         if not response:
-            logging.warning("No response from OpenAIAdapter.")
+            logging.warning(f"No response from {self.name}.")
             return ""
         return response.content
 
+    def stream_invoke(self, prompt: str) -> Iterator[str]:
+        for chunk in self._client.stream(prompt):
+            if chunk.content:
+                yield chunk.content
+
 class GeminiAdapter(BaseLLMAdapter):
     """
     适配 Google Gemini (Google Generative AI) 接口
@@ -175,14 +357,49 @@ class GeminiAdapter(BaseLLMAdapter):
         self.timeout = timeout
         
         # 检测并设置代理（针对中国地区网络访问问题）
+        # 网络探测放到后台线程进行，不阻塞适配器的创建；首次 invoke 前等待其完成
+        self._connectivity_checked = False
+        self._probe_event = threading.Event()
+        threading.Thread(target=self._probe_network, daemon=True).start()
+        
+        # 如果提供了base_url且不为空，则配置自定义endpoint
+        self._endpoint = base_url.strip() if base_url else ""
+        self._apply_global_config()
+        
+        # 创建生成模型；模型在首次请求时才按当时的全局配置绑定客户端
+        import google.generativeai as genai
+        self._model = genai.GenerativeModel(model_name=self.model_name)
+
+        # 生成配置在适配器生命周期内不变，只创建一次
+        self._generation_config = genai.types.GenerationConfig(
+            max_output_tokens=self.max_tokens,
+            temperature=self.temperature,
+        )
+
+    def _apply_global_config(self):
+        """
+        写入 genai 的全局 API 密钥与自定义 endpoint 环境变量；二者均为进程级状态，适配器被复用时需重新设置
+        """
+        import google.generativeai as genai
+        genai.configure(api_key=self.api_key)
+        if self._endpoint:
+            os.environ['GOOGLE_AI_STUDIO_API_ENDPOINT'] = self._endpoint
+
+    def _probe_network(self):
+        """
+        检测Google服务连通性，必要时自动设置代理（在后台线程中运行）
+        """
         try:
+            # 用户已配置代理（如Clash、公司代理）时直接使用，跳过注定失败的直连探测
+            if os.environ.get('HTTP_PROXY') or os.environ.get('HTTPS_PROXY'):
+                logging.info("系统环境变量中已配置代理，跳过直连检测")
+                return
+
             # 首先测试直连
             if not test_google_connectivity():
                 logging.info("直连Google服务失败，尝试检测并设置代理...")
                 proxy_detected = detect_and_setup_proxy()
                 if proxy_detected:
-                    # 等待一下让代理设置生效
-                    time.sleep(1)
                     if test_google_connectivity():
                         logging.info("✅ 代理设置成功，可以访问Google服务")
                     else:
@@ -193,30 +410,24 @@ class GeminiAdapter(BaseLLMAdapter):
                 logging.info("✅ 可以直接访问Google服务")
         except Exception as e:
             logging.warning(f"代理检测过程出错: {e}")
-        
-        # 配置API密钥
-        genai.configure(api_key=self.api_key)
-        
-        # 如果提供了base_url且不为空，则配置自定义endpoint
-        if base_url and base_url.strip():
-            # 设置环境变量来使用自定义endpoint
-            os.environ['GOOGLE_AI_STUDIO_API_ENDPOINT'] = base_url.strip()
-        
-        # 创建生成模型
-        self._model = genai.GenerativeModel(model_name=self.model_name)
-
-    def invoke(self, prompt: str) -> str:
+        finally:
+            self._probe_event.set()
+
+    def _wait_for_probe(self):
+        """
+        首次调用前等待后台网络探测完成，保证代理环境变量已就绪
+        """
+        if not self._connectivity_checked:
+            self._probe_event.wait(timeout=self.timeout)
+            self._connectivity_checked = True
+
+    def _invoke(self, prompt: str) -> str:
+        self._wait_for_probe()
         try:
-            # 创建生成配置
-            generation_config = genai.types.GenerationConfig(
-                max_output_tokens=self.max_tokens,
-                temperature=self.temperature,
-            )
-            
             # 生成内容
             response = self._model.generate_content(
                 contents=prompt,
-                generation_config=generation_config,
+                generation_config=self._generation_config,
                 request_options={"timeout": self.timeout} if self.timeout else None
             )
             
@@ -227,33 +438,48 @@ class GeminiAdapter(BaseLLMAdapter):
                 return ""
                 
         except Exception as e:
-            error_msg = str(e)
-            
-            # 检查是否是网络连接问题
-            if any(keyword in error_msg.lower() for keyword in 
-                   ['connection', 'timeout', 'network', 'proxy', 'ssl', 'certificate']):
-                logging.error(f"Gemini API 网络连接失败: {e}")
-                logging.info("💡 如果您在中国地区，请确保:")
-                logging.info("   1. VPN/代理服务正常运行（如Clash for Windows）")
-                logging.info("   2. 代理端口7890(HTTP)或7891(SOCKS5)可访问")
-                logging.info("   3. 可以在浏览器中正常访问Google")
-                
-                # 尝试重新检测代理
-                if not test_google_connectivity():
-                    logging.info("🔄 正在重新尝试代理检测...")
-                    detect_and_setup_proxy()
-            else:
-                logging.error(f"Gemini API 调用失败: {e}")
-            
+            self._handle_invoke_error(e)
             return ""
 
+    def stream_invoke(self, prompt: str) -> Iterator[str]:
+        self._wait_for_probe()
+        try:
+            response = self._model.generate_content(
+                contents=prompt,
+                generation_config=self._generation_config,
+                stream=True,
+                request_options={"timeout": self.timeout} if self.timeout else None
+            )
+            for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            self._handle_invoke_error(e)
+
+    def _handle_invoke_error(self, e: Exception):
+        error_msg = str(e)
+        
+        # 检查是否是网络连接问题
+        if _NET_ERR_RE.search(error_msg) is not None:
+            logging.error(f"Gemini API 网络连接失败: {e}")
+            logging.info("💡 如果您在中国地区，请确保:")
+            logging.info("   1. VPN/代理服务正常运行（如Clash for Windows）")
+            logging.info("   2. 代理端口7890(HTTP)或7891(SOCKS5)可访问")
+            logging.info("   3. 可以在浏览器中正常访问Google")
+            
+            # 尝试重新检测代理
+            if not test_google_connectivity():
+                logging.info("🔄 正在重新尝试代理检测...")
+                detect_and_setup_proxy(force=True)
+        else:
+            logging.error(f"Gemini API 调用失败: {e}")
+
 class AzureOpenAIAdapter(BaseLLMAdapter):
     """
     适配 Azure OpenAI 接口（使用 langchain.ChatOpenAI）
     """
     def __init__(self, api_key: str, base_url: str, model_name: str, max_tokens: int, temperature: float = 0.7, timeout: Optional[int] = 600):
-        import re
-        match = re.match(r'https://(.+?)/openai/deployments/(.+?)/chat/completions\?api-version=(.+)', base_url)
+        match = _AZURE_OPENAI_RE.match(base_url)
         if match:
             self.azure_endpoint = f"https://{match.group(1)}"
             self.azure_deployment = match.group(2)
@@ -267,6 +493,7 @@ class AzureOpenAIAdapter(BaseLLMAdapter):
         self.temperature = temperature
         self.timeout = timeout
 
+        from langchain_openai import AzureChatOpenAI
         self._client = AzureChatOpenAI(
             azure_endpoint=self.azure_endpoint,
             azure_deployment=self.azure_deployment,
@@ -274,75 +501,38 @@ class AzureOpenAIAdapter(BaseLLMAdapter):
             api_key=self.api_key,
             max_tokens=self.max_tokens,
             temperature=self.temperature,
-            timeout=self.timeout
+            timeout=self.timeout,
+            http_client=get_shared_http_client()
         )
 
-    def invoke(self, prompt: str) -> str:
+    def _invoke(self, prompt: str) -> str:
         response = self._client.invoke(prompt)
         if not response:
             logging.warning("No response from AzureOpenAIAdapter.")
             return ""
         return response.content
 
-class OllamaAdapter(BaseLLMAdapter):
+    def stream_invoke(self, prompt: str) -> Iterator[str]:
+        for chunk in self._client.stream(prompt):
+            if chunk.content:
+                yield chunk.content
+
+class MLStudioAdapter(ChatOpenAICompatibleAdapter):
     """
-    Ollama 同样有一个 OpenAI-like /v1/chat 接口，可直接使用 ChatOpenAI。
+    ML Studio 的 OpenAI-like 接口，调用失败时记录日志并返回空字符串。
     """
-    def __init__(self, api_key: str, base_url: str, model_name: str, max_tokens: int, temperature: float = 0.7, timeout: Optional[int] = 600):
-        self.base_url = check_base_url(base_url)
-        self.api_key = api_key
-        self.model_name = model_name
-        self.max_tokens = max_tokens
-        self.temperature = temperature
-        self.timeout = timeout
-
-        if self.api_key == '':
-            self.api_key= 'ollama'
-
-        self._client = ChatOpenAI(
-            model=self.model_name,
-            api_key=self.api_key,
-            base_url=self.base_url,
-            max_tokens=self.max_tokens,
-            temperature=self.temperature,
-            timeout=self.timeout
-        )
-
-    def invoke(self, prompt: str) -> str:
-        response = self._client.invoke(prompt)
-        if not response:
-            logging.warning("No response from OllamaAdapter.")
+    def _invoke(self, prompt: str) -> str:
+        try:
+            return super()._invoke(prompt)
+        except Exception as e:
+            logging.error(f"ML Studio API 调用超时或失败: {e}")
             return ""
-        return response.content
 
-class MLStudioAdapter(BaseLLMAdapter):
-    def __init__(self, api_key: str, base_url: str, model_name: str, max_tokens: int, temperature: float = 0.7, timeout: Optional[int] = 600):
-        self.base_url = check_base_url(base_url)
-        self.api_key = api_key
-        self.model_name = model_name
-        self.max_tokens = max_tokens
-        self.temperature = temperature
-        self.timeout = timeout
-
-        self._client = ChatOpenAI(
-            model=self.model_name,
-            api_key=self.api_key,
-            base_url=self.base_url,
-            max_tokens=self.max_tokens,
-            temperature=self.temperature,
-            timeout=self.timeout
-        )
-
-    def invoke(self, prompt: str) -> str:
+    def stream_invoke(self, prompt: str) -> Iterator[str]:
         try:
-            response = self._client.invoke(prompt)
-            if not response:
-                logging.warning("No response from MLStudioAdapter.")
-                return ""
-            return response.content
+            yield from super().stream_invoke(prompt)
         except Exception as e:
             logging.error(f"ML Studio API 调用超时或失败: {e}")
-            return ""
 
 class AzureAIAdapter(BaseLLMAdapter):
     """
@@ -350,9 +540,8 @@ class AzureAIAdapter(BaseLLMAdapter):
     使用 azure-ai-inference 库进行API调用
     """
     def __init__(self, api_key: str, base_url: str, model_name: str, max_tokens: int, temperature: float = 0.7, timeout: Optional[int] = 600):
-        import re
         # 匹配形如 https://xxx.services.ai.azure.com/models/chat/completions?api-version=xxx 的URL
-        match = re.match(r'https://(.+?)\.services\.ai\.azure\.com(?:/models)?(?:/chat/completions)?(?:\?api-version=(.+))?', base_url)
+        match = _AZURE_AI_RE.match(base_url)
         if match:
             # endpoint需要是形如 https://xxx.services.ai.azure.com/models 的格式
             self.endpoint = f"https://{match.group(1)}.services.ai.azure.com/models"
@@ -368,6 +557,11 @@ class AzureAIAdapter(BaseLLMAdapter):
         self.temperature = temperature
         self.timeout = timeout
 
+        from azure.ai.inference import ChatCompletionsClient
+        from azure.ai.inference.models import SystemMessage, UserMessage
+        from azure.core.credentials import AzureKeyCredential
+        self._system_msg = SystemMessage("You are a helpful assistant.")
+        self._user_msg_cls = UserMessage
         self._client = ChatCompletionsClient(
             endpoint=self.endpoint,
             credential=AzureKeyCredential(self.api_key),
@@ -377,12 +571,12 @@ class AzureAIAdapter(BaseLLMAdapter):
             timeout=self.timeout
         )
 
-    def invoke(self, prompt: str) -> str:
+    def _invoke(self, prompt: str) -> str:
         try:
             response = self._client.complete(
                 messages=[
-                    SystemMessage("You are a helpful assistant."),
-                    UserMessage(prompt)
+                    self._system_msg,
+                    self._user_msg_cls(prompt)
                 ]
             )
             if response and response.choices:
@@ -394,6 +588,21 @@ class AzureAIAdapter(BaseLLMAdapter):
             logging.error(f"Azure AI Inference API 调用失败: {e}")
             return ""
 
+    def stream_invoke(self, prompt: str) -> Iterator[str]:
+        try:
+            response = self._client.complete(
+                stream=True,
+                messages=[
+                    self._system_msg,
+                    self._user_msg_cls(prompt)
+                ]
+            )
+            for update in response:
+                if update.choices and update.choices[0].delta.content:
+                    yield update.choices[0].delta.content
+        except Exception as e:
+            logging.error(f"Azure AI Inference API 调用失败: {e}")
+
 # 火山引擎实现
 class VolcanoEngineAIAdapter(BaseLLMAdapter):
     def __init__(self, api_key: str, base_url: str, model_name: str, max_tokens: int, temperature: float = 0.7, timeout: Optional[int] = 600):
@@ -404,19 +613,19 @@ class VolcanoEngineAIAdapter(BaseLLMAdapter):
         self.temperature = temperature
         self.timeout = timeout
 
+        self._system_msg = {"role": "system", "content": "你是DeepSeek，是一个 AI 人工智能助手"}
+        from openai import OpenAI
         self._client = OpenAI(
             base_url=base_url,
             api_key=api_key,
-            timeout=timeout  # 添加超时配置
+            timeout=timeout,  # 添加超时配置
+            http_client=get_shared_http_client()
         )
-    def invoke(self, prompt: str) -> str:
+    def _invoke(self, prompt: str) -> str:
         try:
             response = self._client.chat.completions.create(
                 model=self.model_name,
-                messages=[
-                    {"role": "system", "content": "你是DeepSeek，是一个 AI 人工智能助手"},
-                    {"role": "user", "content": prompt},
-                ],
+                messages=[self._system_msg, {"role": "user", "content": prompt}],
                 timeout=self.timeout  # 添加超时参数
             )
             if not response:
@@ -427,6 +636,18 @@ class VolcanoEngineAIAdapter(BaseLLMAdapter):
             logging.error(f"火山引擎API调用超时或失败: {e}")
             return ""
 
+    def stream_invoke(self, prompt: str) -> Iterator[str]:
+        try:
+            stream = self._client.chat.completions.create(
+                model=self.model_name,
+                messages=[self._system_msg, {"role": "user", "content": prompt}],
+                stream=True,
+                timeout=self.timeout
+            )
+            yield from _iter_openai_stream(stream)
+        except Exception as e:
+            logging.error(f"火山引擎API调用超时或失败: {e}")
+
 class SiliconFlowAdapter(BaseLLMAdapter):
     def __init__(self, api_key: str, base_url: str, model_name: str, max_tokens: int, temperature: float = 0.7, timeout: Optional[int] = 600):
         self.base_url = check_base_url(base_url)
@@ -436,19 +657,19 @@ class SiliconFlowAdapter(BaseLLMAdapter):
         self.temperature = temperature
         self.timeout = timeout
 
+        self._system_msg = {"role": "system", "content": "你是DeepSeek，是一个 AI 人工智能助手"}
+        from openai import OpenAI
         self._client = OpenAI(
             base_url=base_url,
             api_key=api_key,
-            timeout=timeout  # 添加超时配置
+            timeout=timeout,  # 添加超时配置
+            http_client=get_shared_http_client()
         )
-    def invoke(self, prompt: str) -> str:
+    def _invoke(self, prompt: str) -> str:
         try:
             response = self._client.chat.completions.create(
                 model=self.model_name,
-                messages=[
-                    {"role": "system", "content": "你是DeepSeek，是一个 AI 人工智能助手"},
-                    {"role": "user", "content": prompt},
-                ],
+                messages=[self._system_msg, {"role": "user", "content": prompt}],
                 timeout=self.timeout  # 添加超时参数
             )
             if not response:
@@ -458,6 +679,18 @@ class SiliconFlowAdapter(BaseLLMAdapter):
         except Exception as e:
             logging.error(f"硅基流动API调用超时或失败: {e}")
             return ""
+
+    def stream_invoke(self, prompt: str) -> Iterator[str]:
+        try:
+            stream = self._client.chat.completions.create(
+                model=self.model_name,
+                messages=[self._system_msg, {"role": "user", "content": prompt}],
+                stream=True,
+                timeout=self.timeout
+            )
+            yield from _iter_openai_stream(stream)
+        except Exception as e:
+            logging.error(f"硅基流动API调用超时或失败: {e}")
 # grok實現
 class GrokAdapter(BaseLLMAdapter):
     """
@@ -471,20 +704,20 @@ class GrokAdapter(BaseLLMAdapter):
         self.temperature = temperature
         self.timeout = timeout
 
+        self._system_msg = {"role": "system", "content": "You are Grok, created by xAI."}
+        from openai import OpenAI
         self._client = OpenAI(
             base_url=self.base_url,
             api_key=self.api_key,
-            timeout=self.timeout
+            timeout=self.timeout,
+            http_client=get_shared_http_client()
         )
 
-    def invoke(self, prompt: str) -> str:
+    def _invoke(self, prompt: str) -> str:
         try:
             response = self._client.chat.completions.create(
                 model=self.model_name,
-                messages=[
-                    {"role": "system", "content": "You are Grok, created by xAI."},
-                    {"role": "user", "content": prompt},
-                ],
+                messages=[self._system_msg, {"role": "user", "content": prompt}],
                 max_tokens=self.max_tokens,
                 temperature=self.temperature,
                 timeout=self.timeout
@@ -498,6 +731,108 @@ class GrokAdapter(BaseLLMAdapter):
             logging.error(f"Grok API 调用失败: {e}")
             return ""
 
+    def stream_invoke(self, prompt: str) -> Iterator[str]:
+        try:
+            stream = self._client.chat.completions.create(
+                model=self.model_name,
+                messages=[self._system_msg, {"role": "user", "content": prompt}],
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                stream=True,
+                timeout=self.timeout
+            )
+            yield from _iter_openai_stream(stream)
+        except Exception as e:
+            logging.error(f"Grok API 调用失败: {e}")
+
+class BatchingAdapter(BaseLLMAdapter):
+    """
+    批量调度包装器：调用方提交的 prompt 进入队列，由 max_concurrency 个协程并发调用内部适配器的 ainvoke，
+    结果通过 Future 返回。适合离线批量生成章节等吞吐优先的场景，可包装任意适配器。
+    """
+    def __init__(self, inner: BaseLLMAdapter, max_concurrency: int = 4):
+        self.inner = inner
+        self.model_name = getattr(inner, "model_name", "")
+        self.max_concurrency = max_concurrency
+
+        # 独立的事件循环运行在后台线程中，队列与工作协程都归属于它
+        self._loop = asyncio.new_event_loop()
+        self._queue: Optional[asyncio.Queue] = None
+        self._ready = threading.Event()
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        self._workers = [self._loop.create_task(self._worker()) for _ in range(self.max_concurrency)]
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    async def _worker(self):
+        while True:
+            prompt, future = await self._queue.get()
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    result = await self.inner.ainvoke(prompt)
+                except asyncio.CancelledError:
+                    future.set_exception(RuntimeError("BatchingAdapter 已关闭"))
+                    raise
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, prompt: str) -> Future:
+        """
+        提交一个 prompt，立即返回 concurrent.futures.Future；close() 之后调用会抛出 RuntimeError
+        """
+        future = Future()
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("BatchingAdapter 已关闭")
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, (prompt, future))
+        return future
+
+    def _invoke(self, prompt: str) -> str:
+        return self.submit(prompt).result()
+
+    async def ainvoke(self, prompt: str) -> str:
+        return await asyncio.wrap_future(self.submit(prompt))
+
+    async def _shutdown(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        # 队列中尚未处理的请求直接以异常结束，避免调用方永远等待
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if future.set_running_or_notify_cancel():
+                future.set_exception(RuntimeError("BatchingAdapter 已关闭"))
+        self._loop.stop()
+
+    def close(self):
+        """
+        停止工作协程与后台事件循环；正在执行与排队中的请求以 RuntimeError 结束
+        """
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop)
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+
 def set_manual_proxy(http_proxy: str, https_proxy: str = None):
     """
     手动设置代理
@@ -509,15 +844,13 @@ def set_manual_proxy(http_proxy: str, https_proxy: str = None):
     if https_proxy is None:
         https_proxy = http_proxy
     
-    os.environ['HTTP_PROXY'] = http_proxy
-    os.environ['HTTPS_PROXY'] = https_proxy
-    os.environ['http_proxy'] = http_proxy  # 小写版本
-    os.environ['https_proxy'] = https_proxy
+    _set_proxy_env(http_proxy, https_proxy)
+    _create_llm_adapter_cached.cache_clear()
     
     logging.info(f"手动设置代理: HTTP={http_proxy}, HTTPS={https_proxy}")
     
     # 测试连接
-    if test_google_connectivity():
+    if test_google_connectivity(force=True):
         logging.info("✅ 代理设置成功，可以访问Google服务")
         return True
     else:
@@ -528,10 +861,11 @@ def clear_proxy():
     """
     清除代理设置
     """
-    proxy_vars = ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy']
-    for var in proxy_vars:
-        if var in os.environ:
-            del os.environ[var]
+    global _PROXY_DETECTED
+    for var in _PROXY_ENV_KEYS:
+        os.environ.pop(var, None)
+    _PROXY_DETECTED = None
+    _create_llm_adapter_cached.cache_clear()
     logging.info("已清除代理设置")
 
 def test_gemini_connection(api_key: str):
@@ -553,8 +887,9 @@ def test_gemini_connection(api_key: str):
             return False
             
         # 尝试创建一个简单的API调用
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-pro')
+        model = genai.GenerativeModel(model_name='gemini-pro')
         response = model.generate_content("Hello")
         
         if response and response.text:
@@ -570,7 +905,7 @@ def test_gemini_connection(api_key: str):
         # 提供一些解决建议
         if "API_KEY" in str(e).upper():
             logging.info("💡 请检查API密钥是否正确")
-        elif any(keyword in str(e).lower() for keyword in ['connection', 'timeout', 'network']):
+        elif _NET_ERR_RE.search(str(e)) is not None:
             logging.info("💡 网络连接问题，建议:")
             logging.info("   1. 确保Clash等代理正常运行")
             logging.info("   2. 尝试运行: set_manual_proxy('http://127.0.0.1:7890')")
@@ -589,24 +924,44 @@ def create_llm_adapter(
 ) -> BaseLLMAdapter:
     """
     工厂函数：根据 interface_format 返回不同的适配器实例。
+    相同配置且代理设置未变时复用已创建的适配器（及其底层 HTTP 连接池）。
     """
+    adapter = _create_llm_adapter_cached(interface_format, base_url, model_name, api_key, temperature, max_tokens, timeout,
+                                         _proxy_env_key())
+    if isinstance(adapter, GeminiAdapter):
+        # Gemini 的 API 密钥与 endpoint 是全局配置，复用时需重新写入
+        adapter._apply_global_config()
+    return adapter
+
+@functools.lru_cache(maxsize=32)
+def _create_llm_adapter_cached(
+    interface_format: str,
+    base_url: str,
+    model_name: str,
+    api_key: str,
+    temperature: float,
+    max_tokens: int,
+    timeout: int,
+    proxies: tuple
+) -> BaseLLMAdapter:
+    # proxies 仅参与缓存键：适配器持有的 HTTP 客户端在创建时固定了代理
     fmt = interface_format.strip().lower()
     if fmt == "deepseek":
-        return DeepSeekAdapter(api_key, base_url, model_name, max_tokens, temperature, timeout)
+        return ChatOpenAICompatibleAdapter(api_key, base_url, model_name, max_tokens, temperature, timeout, name="DeepSeekAdapter")
     elif fmt == "openai":
-        return OpenAIAdapter(api_key, base_url, model_name, max_tokens, temperature, timeout)
+        return ChatOpenAICompatibleAdapter(api_key, base_url, model_name, max_tokens, temperature, timeout, name="OpenAIAdapter")
     elif fmt == "azure openai":
         return AzureOpenAIAdapter(api_key, base_url, model_name, max_tokens, temperature, timeout)
     elif fmt == "azure ai":
         return AzureAIAdapter(api_key, base_url, model_name, max_tokens, temperature, timeout)
     elif fmt == "ollama":
-        return OllamaAdapter(api_key, base_url, model_name, max_tokens, temperature, timeout)
+        return ChatOpenAICompatibleAdapter(api_key, base_url, model_name, max_tokens, temperature, timeout, name="OllamaAdapter", default_api_key="ollama")
     elif fmt == "ml studio":
-        return MLStudioAdapter(api_key, base_url, model_name, max_tokens, temperature, timeout)
+        return MLStudioAdapter(api_key, base_url, model_name, max_tokens, temperature, timeout, name="MLStudioAdapter")
     elif fmt == "gemini":
         return GeminiAdapter(api_key, base_url, model_name, max_tokens, temperature, timeout)
     elif fmt == "阿里云百炼":
-        return OpenAIAdapter(api_key, base_url, model_name, max_tokens, temperature, timeout)
+        return ChatOpenAICompatibleAdapter(api_key, base_url, model_name, max_tokens, temperature, timeout, name="阿里云百炼")
     elif fmt == "火山引擎":
         return VolcanoEngineAIAdapter(api_key, base_url, model_name, max_tokens, temperature, timeout)
     elif fmt == "硅基流动":
@@ -1,10 +1,72 @@
 # ui/chapters_tab.py
 # -*- coding: utf-8 -*-
+import logging
 import os
+import re
+import threading
 import customtkinter as ctk
-from tkinter import messagebox
+from tkinter import messagebox, TclError
 from ui.context_menu import TextWidgetContextMenu
-from utils import read_file, save_string_to_txt, clear_file_content
+from utils import save_string_to_txt
+
+_CHAP_RE = re.compile(r"^chapter_(\d+)\.txt$")
+
+def _list_chapter_numbers(chapters_dir):
+    """
+    返回 chapters_dir 下按章节号排序的章节号字符串列表，目录不存在时返回 None。
+    """
+    pairs = []
+    try:
+        with os.scandir(chapters_dir) as it:
+            for entry in it:
+                m = _CHAP_RE.match(entry.name)
+                if m and entry.is_file(follow_symlinks=False):
+                    pairs.append((int(m.group(1)), m.group(1)))
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    pairs.sort()
+    return [num for _, num in pairs]
+
+# 在 Tcl 侧完成读文件与插入，正文不必往返 Python 字符串
+_LOAD_FILE_PROC = """
+proc ::_novel_load_file {w path} {
+    set ch [open $path r]
+    fconfigure $ch -encoding utf-8
+    set rc [catch {read $ch} data]
+    close $ch
+    if {$rc} { return -code error $data }
+    $w delete 1.0 end
+    $w insert 1.0 $data
+}
+"""
+
+def _load_file_into_text(text_widget, path):
+    """由 Tcl 直接读取 path 并替换 text_widget（底层 tkinter.Text）的内容。"""
+    tk = text_widget.tk
+    if not tk.call("info", "commands", "::_novel_load_file"):
+        tk.eval(_LOAD_FILE_PROC)
+    tk.call("::_novel_load_file", text_widget._w, path)
+
+def _update_chapter_paths(self):
+    """保存路径变化时重建 chapters 目录路径，返回 chapters 目录。"""
+    filepath = self.filepath_var.get().strip()
+    if filepath != self._chapters_root:
+        self._chapters_root = filepath
+        self._chapters_dir = os.path.join(filepath, "chapters")
+    return self._chapters_dir
+
+def _chapter_file(self, chapter_number_str):
+    # 保存路径中可能含有花括号，不能把它拼进 str.format 模板
+    return os.path.join(_update_chapter_paths(self), f"chapter_{chapter_number_str}.txt")
+
+# 章节页各控件共用的字体对象，需在根窗口创建后才能构造，故延迟初始化
+_YAHEI_12 = None
+
+def yahei_12():
+    global _YAHEI_12
+    if _YAHEI_12 is None:
+        _YAHEI_12 = ctk.CTkFont(family="Microsoft YaHei", size=12)
+    return _YAHEI_12
 
 def build_chapters_tab(self):
     self.chapters_view_tab = self.tabview.add("Chapters Manage")
@@ -20,60 +82,96 @@ def build_chapters_tab(self):
     top_frame.columnconfigure(3, weight=0)
     top_frame.columnconfigure(4, weight=1)
 
-    prev_btn = ctk.CTkButton(top_frame, text="<< 上一章", command=self.prev_chapter, font=("Microsoft YaHei", 12))
+    prev_btn = ctk.CTkButton(top_frame, text="<< 上一章", command=self.prev_chapter, font=yahei_12())
     prev_btn.grid(row=0, column=0, padx=5, pady=5, sticky="w")
 
-    next_btn = ctk.CTkButton(top_frame, text="下一章 >>", command=self.next_chapter, font=("Microsoft YaHei", 12))
+    next_btn = ctk.CTkButton(top_frame, text="下一章 >>", command=self.next_chapter, font=yahei_12())
     next_btn.grid(row=0, column=1, padx=5, pady=5, sticky="w")
 
     self.chapter_select_var = ctk.StringVar(value="")
-    self.chapter_select_menu = ctk.CTkOptionMenu(top_frame, values=[], variable=self.chapter_select_var, command=self.on_chapter_selected, font=("Microsoft YaHei", 12))
+    self.chapter_select_menu = ctk.CTkOptionMenu(top_frame, values=[], variable=self.chapter_select_var, command=self.on_chapter_selected, font=yahei_12())
     self.chapter_select_menu.grid(row=0, column=2, padx=5, pady=5, sticky="w")
 
-    save_btn = ctk.CTkButton(top_frame, text="保存修改", command=self.save_current_chapter, font=("Microsoft YaHei", 12))
+    save_btn = ctk.CTkButton(top_frame, text="保存修改", command=self.save_current_chapter, font=yahei_12())
     save_btn.grid(row=0, column=3, padx=5, pady=5, sticky="w")
 
-    refresh_btn = ctk.CTkButton(top_frame, text="刷新章节列表", command=self.refresh_chapters_list, font=("Microsoft YaHei", 12))
+    refresh_btn = ctk.CTkButton(top_frame, text="刷新章节列表", command=self.refresh_chapters_list, font=yahei_12())
     refresh_btn.grid(row=0, column=5, padx=5, pady=5, sticky="e")
 
-    self.chapters_word_count_label = ctk.CTkLabel(top_frame, text="字数：0", font=("Microsoft YaHei", 12))
+    self.chapters_word_count_label = ctk.CTkLabel(top_frame, text="字数：0", font=yahei_12())
     self.chapters_word_count_label.grid(row=0, column=4, padx=(0,10), sticky="e")
 
-    self.chapter_view_text = ctk.CTkTextbox(self.chapters_view_tab, wrap="word", font=("Microsoft YaHei", 12))
+    self.chapter_view_text = ctk.CTkTextbox(self.chapters_view_tab, wrap="word", font=yahei_12())
     
-    def update_word_count(event=None):
-        text = self.chapter_view_text.get("0.0", "end-1c")
-        text_length = len(text)
+    self._wc_after_id = None
+
+    def do_word_count():
+        self._wc_after_id = None
+        # 直接让 Tk 统计字符数，避免把整段正文复制成 Python 字符串
+        text_widget = self.chapter_view_text._textbox
+        text_length = text_widget.tk.call(text_widget._w, "count", "-chars", "1.0", "end-1c")
         self.chapters_word_count_label.configure(text=f"字数：{text_length}")
+
+    def update_word_count(event=None):
+        # 仅在内容真正变化时统计；重置 modified 标志以便下次修改再次触发
+        text_widget = self.chapter_view_text._textbox
+        if not text_widget.edit_modified():
+            return
+        text_widget.edit_modified(False)
+        # 连续输入时合并为一次统计
+        if self._wc_after_id is not None:
+            self.master.after_cancel(self._wc_after_id)
+        self._wc_after_id = self.master.after(150, do_word_count)
     
-    self.chapter_view_text.bind("<KeyRelease>", update_word_count)
-    self.chapter_view_text.bind("<ButtonRelease>", update_word_count)
+    self.chapter_view_text.bind("<<Modified>>", update_word_count)
     TextWidgetContextMenu(self.chapter_view_text)
     self.chapter_view_text.grid(row=1, column=0, sticky="nsew", padx=5, pady=5, columnspan=6)
 
     self.chapters_list = []
-    refresh_chapters_list(self)
+    self._chapter_index = {}
+    self._chapters_root = None
+    self._scan_in_flight = False
+    self._scan_pending = False
+    # 等事件循环启动后再开始首次扫描，保证后台线程能通过 after 回传结果
+    self.master.after_idle(refresh_chapters_list, self)
 
 def refresh_chapters_list(self):
-    filepath = self.filepath_var.get().strip()
-    chapters_dir = os.path.join(filepath, "chapters")
-    if not os.path.exists(chapters_dir):
+    # 目录扫描放到后台线程，避免 chapters 位于网络盘等慢速存储时卡住界面
+    if self._scan_in_flight:
+        self._scan_pending = True
+        return
+    self._scan_in_flight = True
+    chapters_dir = _update_chapter_paths(self)
+
+    def task():
+        try:
+            chapter_nums = _list_chapter_numbers(chapters_dir)
+        except Exception:
+            # 任何扫描错误都要回传，否则 _scan_in_flight 不会被清除
+            logging.exception(f"扫描章节目录 {chapters_dir} 失败")
+            chapter_nums = None
+        self.master.after(0, _apply_chapter_list, self, chapter_nums)
+
+    threading.Thread(target=task, daemon=True).start()
+
+def _apply_chapter_list(self, chapter_nums):
+    self._scan_in_flight = False
+    if self._scan_pending:
+        # 扫描期间又请求过刷新，以最新状态重新扫描
+        self._scan_pending = False
+        refresh_chapters_list(self)
+        return
+
+    if chapter_nums is None:
         self.safe_log("尚未找到 chapters 文件夹，请先生成章节或检查保存路径。")
         self.chapter_select_menu.configure(values=[])
         return
 
-    all_files = os.listdir(chapters_dir)
-    chapter_nums = []
-    for f in all_files:
-        if f.startswith("chapter_") and f.endswith(".txt"):
-            number_part = f.replace("chapter_", "").replace(".txt", "")
-            if number_part.isdigit():
-                chapter_nums.append(number_part)
-    chapter_nums.sort(key=lambda x: int(x))
     self.chapters_list = chapter_nums
+    self._chapter_index = {num: i for i, num in enumerate(chapter_nums)}
     self.chapter_select_menu.configure(values=self.chapters_list)
     current_selected = self.chapter_select_var.get()
-    if current_selected not in self.chapters_list:
+    if current_selected not in self._chapter_index:
         if self.chapters_list:
             self.chapter_select_var.set(self.chapters_list[0])
             load_chapter_content(self, self.chapters_list[0])
@@ -87,14 +185,12 @@ def on_chapter_selected(self, value):
 def load_chapter_content(self, chapter_number_str):
     if not chapter_number_str:
         return
-    filepath = self.filepath_var.get().strip()
-    chapter_file = os.path.join(filepath, "chapters", f"chapter_{chapter_number_str}.txt")
-    if not os.path.exists(chapter_file):
-        self.safe_log(f"章节文件 {chapter_file} 不存在！")
-        return
-    content = read_file(chapter_file)
-    self.chapter_view_text.delete("0.0", "end")
-    self.chapter_view_text.insert("0.0", content)
+    chapter_file = _chapter_file(self, chapter_number_str)
+    # 不预先 exists 检查，由打开文件本身报告不存在、无权限或编码错误
+    try:
+        _load_file_into_text(self.chapter_view_text._textbox, chapter_file)
+    except TclError as e:
+        self.safe_log(f"无法读取章节文件 {chapter_file}: {e}")
 
 def save_current_chapter(self):
     chapter_number_str = self.chapter_select_var.get()
@@ -105,9 +201,8 @@ def save_current_chapter(self):
     if not filepath:
         messagebox.showwarning("警告", "请先配置保存文件路径")
         return
-    chapter_file = os.path.join(filepath, "chapters", f"chapter_{chapter_number_str}.txt")
-    content = self.chapter_view_text.get("0.0", "end").strip()
-    clear_file_content(chapter_file)
+    chapter_file = _chapter_file(self, chapter_number_str)
+    content = self.chapter_view_text.get("0.0", "end-1c").rstrip()
     save_string_to_txt(content, chapter_file)
     self.safe_log(f"已保存对第 {chapter_number_str} 章的修改。")
 
@@ -115,9 +210,9 @@ def prev_chapter(self):
     if not self.chapters_list:
         return
     current = self.chapter_select_var.get()
-    if current not in self.chapters_list:
+    idx = self._chapter_index.get(current)
+    if idx is None:
         return
-    idx = self.chapters_list.index(current)
     if idx > 0:
         new_idx = idx - 1
         self.chapter_select_var.set(self.chapters_list[new_idx])
@@ -129,9 +224,9 @@ def next_chapter(self):
     if not self.chapters_list:
         return
     current = self.chapter_select_var.get()
-    if current not in self.chapters_list:
+    idx = self._chapter_index.get(current)
+    if idx is None:
         return
-    idx = self.chapters_list.index(current)
     if idx < len(self.chapters_list) - 1:
         new_idx = idx + 1
         self.chapter_select_var.set(self.chapters_list[new_idx])
@@ -7,33 +7,49 @@ import traceback
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from .role_library import RoleLibrary
-from llm_adapters import create_llm_adapter
 
 from config_manager import load_config, save_config, test_llm_config, test_embedding_config
-from utils import read_file, save_string_to_txt, clear_file_content
 from tooltips import tooltips
 
-from ui.context_menu import TextWidgetContextMenu
 from ui.main_tab import build_main_tab, build_left_layout, build_right_layout
 from ui.config_tab import build_config_tabview, load_config_btn, save_config_btn
 from ui.novel_params_tab import build_novel_params_area, build_optional_buttons_area
-from ui.generation_handlers import (
-    generate_novel_architecture_ui,
-    generate_chapter_blueprint_ui,
-    generate_chapter_draft_ui,
-    finalize_chapter_ui,
-    do_consistency_check,
-    import_knowledge_handler,
-    clear_vectorstore_handler,
-    show_plot_arcs_ui
-)
 from ui.setting_tab import build_setting_tab, load_novel_architecture, save_novel_architecture
 from ui.directory_tab import build_directory_tab, load_chapter_blueprint, save_chapter_blueprint
 from ui.character_tab import build_character_tab, load_character_state, save_character_state
 from ui.summary_tab import build_summary_tab, load_global_summary, save_global_summary
 from ui.chapters_tab import build_chapters_tab, refresh_chapters_list, on_chapter_selected, load_chapter_content, save_current_chapter, prev_chapter, next_chapter
 
+def _themed_listbox_options(widget) -> dict:
+    """
+    按当前外观模式与控件缩放，为原生 tk.Listbox 生成与 customtkinter 主题一致的颜色与字体参数。
+    """
+    mode = 1 if ctk.get_appearance_mode() == "Dark" else 0
+    textbox_theme = ctk.ThemeManager.theme["CTkTextbox"]
+    button_theme = ctk.ThemeManager.theme["CTkButton"]
+    scaling = ctk.ScalingTracker.get_widget_scaling(widget)
+    return {
+        "bg": textbox_theme["fg_color"][mode],
+        "fg": textbox_theme["text_color"][mode],
+        "selectbackground": button_theme["fg_color"][mode],
+        "selectforeground": button_theme["text_color"][mode],
+        "highlightthickness": 0,
+        "borderwidth": 0,
+        # 与 CTk 控件一致：负数字号表示像素大小，并乘以控件缩放比例
+        "font": ("Microsoft YaHei", -abs(round(12 * scaling))),
+    }
+
+def _lazy_handler(name: str):
+    """
+    返回一个转发到 ui.generation_handlers 中同名函数的方法。
+    generation_handlers 依赖 LLM/向量库等较重的模块，推迟到首次点击按钮时才导入，加快窗口启动。
+    """
+    def method(self, *args, **kwargs):
+        from ui import generation_handlers
+        return getattr(generation_handlers, name)(self, *args, **kwargs)
+    method.__name__ = name
+    return method
+
 class NovelGeneratorGUI:
     """
     小说生成器的主GUI类，包含所有的界面布局、事件处理、与后端逻辑的交互等。
@@ -41,6 +57,10 @@ class NovelGeneratorGUI:
     def __init__(self, master):
         self.master = master
         self.master.title("Novel Generator GUI")
+        # 日志缓冲：后台线程的日志先攒起来，空闲时一次性写入日志框
+        self._log_buf = []
+        self._log_lock = threading.Lock()
+        self._log_flush_scheduled = False
         try:
             if os.path.exists("icon.ico"):
                 self.master.iconbitmap("icon.ico")
@@ -153,19 +173,40 @@ class NovelGeneratorGUI:
             return default
 
     def log(self, message: str):
+        # 主线程调用：连同尚未写入的缓冲一起立即输出，保持日志顺序
+        with self._log_lock:
+            self._log_buf.append(message + "\n")
+        self._flush_log()
+
+    def safe_log(self, message: str):
+        with self._log_lock:
+            self._log_buf.append(message + "\n")
+            if self._log_flush_scheduled:
+                return
+            self._log_flush_scheduled = True
+        self.master.after_idle(self._flush_log)
+
+    def _flush_log(self):
+        with self._log_lock:
+            buf = self._log_buf
+            self._log_buf = []
+            self._log_flush_scheduled = False
+        if not buf:
+            return
         self.log_text.configure(state="normal")
-        self.log_text.insert("end", message + "\n")
+        self.log_text.insert("end", "".join(buf))
         self.log_text.see("end")
         self.log_text.configure(state="disabled")
 
-    def safe_log(self, message: str):
-        self.master.after(0, lambda: self.log(message))
-
     def disable_button_safe(self, btn):
-        self.master.after(0, lambda: btn.configure(state="disabled"))
+        self.master.after(0, self._set_btn_state, btn, "disabled")
 
     def enable_button_safe(self, btn):
-        self.master.after(0, lambda: btn.configure(state="normal"))
+        self.master.after(0, self._set_btn_state, btn, "normal")
+
+    @staticmethod
+    def _set_btn_state(btn, state):
+        btn.configure(state=state)
 
     def handle_exception(self, context: str):
         full_message = f"{context}\n{traceback.format_exc()}"
@@ -242,59 +283,55 @@ class NovelGeneratorGUI:
         
         # 获取角色库路径
         role_lib_path = os.path.join(self.filepath_var.get().strip(), "角色库")
-        self.selected_roles = []  # 存储选中的角色名称
+        self.role_listboxes = []  # 每个分类一个多选列表
         
         # 动态加载角色分类
         if os.path.exists(role_lib_path):
             # 配置网格布局参数
             scroll_frame.columnconfigure(0, weight=1)
-            max_roles_per_row = 4
             current_row = 0
+            seen_roles = set()  # 已添加的角色名，跨分类去重
             
-            for category in os.listdir(role_lib_path):
-                category_path = os.path.join(role_lib_path, category)
-                if os.path.isdir(category_path):
-                    # 创建分类容器
-                    category_frame = ctk.CTkFrame(scroll_frame)
-                    category_frame.grid(row=current_row, column=0, sticky="w", pady=(10,5), padx=5)
-                    
-                    # 添加分类标签
-                    category_label = ctk.CTkLabel(category_frame, text=f"【{category}】", 
-                                                font=("Microsoft YaHei", 12, "bold"))
-                    category_label.grid(row=0, column=0, padx=(0,10), sticky="w")
-                    
-                    # 初始化角色排列参数
-                    role_count = 0
-                    row_num = 0
-                    col_num = 1  # 从第1列开始（第0列是分类标签）
-                    
-                    # 添加角色复选框
-                    for role_file in os.listdir(category_path):
-                        if role_file.endswith(".txt"):
-                            role_name = os.path.splitext(role_file)[0]
-                            if not any(name == role_name for _, name in self.selected_roles):
-                                chk = ctk.CTkCheckBox(category_frame, text=role_name)
-                                chk.grid(row=row_num, column=col_num, padx=5, pady=2, sticky="w")
-                                self.selected_roles.append((chk, role_name))
-                                
-                                # 更新行列位置
-                                role_count += 1
-                                col_num += 1
-                                if col_num > max_roles_per_row:
-                                    col_num = 1
-                                    row_num += 1
-                    
-                    # 如果没有角色，调整分类标签占满整行
-                    if role_count == 0:
-                        category_label.grid(columnspan=max_roles_per_row+1, sticky="w")
-                    
-                    # 更新主布局的行号
-                    current_row += 1
-                    
-                    # 添加分隔线
-                    separator = ctk.CTkFrame(scroll_frame, height=1, fg_color="gray")
-                    separator.grid(row=current_row, column=0, sticky="ew", pady=5)
-                    current_row += 1
+            with os.scandir(role_lib_path) as entries:
+                category_entries = [entry for entry in entries if entry.is_dir()]
+
+            for category_entry in category_entries:
+                # 创建分类容器
+                category_frame = ctk.CTkFrame(scroll_frame)
+                category_frame.grid(row=current_row, column=0, sticky="ew", pady=(10,5), padx=5)
+                category_frame.columnconfigure(1, weight=1)
+                
+                # 添加分类标签
+                category_label = ctk.CTkLabel(category_frame, text=f"【{category_entry.name}】", 
+                                            font=("Microsoft YaHei", 12, "bold"))
+                category_label.grid(row=0, column=0, padx=(0,10), sticky="nw")
+                
+                # 收集本分类下的角色名
+                with os.scandir(category_entry.path) as role_entries:
+                    role_names = [entry.name[:-4] for entry in role_entries if entry.name.endswith(".txt")]
+                new_names = []
+                for role_name in role_names:
+                    if role_name in seen_roles:
+                        continue
+                    seen_roles.add(role_name)
+                    new_names.append(role_name)
+                
+                # 整个分类用一个多选列表承载，代替逐个角色创建复选框
+                if new_names:
+                    lb = tk.Listbox(category_frame, selectmode=tk.MULTIPLE, exportselection=False,
+                                    height=len(new_names), activestyle="none",
+                                    **_themed_listbox_options(category_frame))
+                    lb.insert(tk.END, *new_names)
+                    lb.grid(row=0, column=1, padx=5, pady=2, sticky="ew")
+                    self.role_listboxes.append(lb)
+                
+                # 更新主布局的行号
+                current_row += 1
+                
+                # 添加分隔线
+                separator = ctk.CTkFrame(scroll_frame, height=1, fg_color="gray")
+                separator.grid(row=current_row, column=0, sticky="ew", pady=5)
+                current_row += 1
         
         # 底部按钮框架
         btn_frame = ctk.CTkFrame(main_frame)
@@ -302,7 +339,7 @@ class NovelGeneratorGUI:
         
         # 选择按钮
         def confirm_selection():
-            selected = [name for chk, name in self.selected_roles if chk.get() == 1]
+            selected = [lb.get(i) for lb in self.role_listboxes for i in lb.curselection()]
             self.char_inv_text.delete("0.0", "end")
             self.char_inv_text.insert("0.0", ", ".join(selected))
             import_window.destroy()
@@ -320,6 +357,9 @@ class NovelGeneratorGUI:
             messagebox.showwarning("警告", "请先设置保存路径")
             return
         
+        from llm_adapters import create_llm_adapter
+        from ui.role_library import RoleLibrary
+
         # 初始化LLM适配器
         llm_adapter = create_llm_adapter(
             interface_format=self.interface_format_var.get(),
@@ -339,14 +379,14 @@ class NovelGeneratorGUI:
         self._role_lib = RoleLibrary(self.master, save_path, llm_adapter)  # 新增参数
 
     # ----------------- 将导入的各模块函数直接赋给类方法 -----------------
-    generate_novel_architecture_ui = generate_novel_architecture_ui
-    generate_chapter_blueprint_ui = generate_chapter_blueprint_ui
-    generate_chapter_draft_ui = generate_chapter_draft_ui
-    finalize_chapter_ui = finalize_chapter_ui
-    do_consistency_check = do_consistency_check
-    import_knowledge_handler = import_knowledge_handler
-    clear_vectorstore_handler = clear_vectorstore_handler
-    show_plot_arcs_ui = show_plot_arcs_ui
+    generate_novel_architecture_ui = _lazy_handler("generate_novel_architecture_ui")
+    generate_chapter_blueprint_ui = _lazy_handler("generate_chapter_blueprint_ui")
+    generate_chapter_draft_ui = _lazy_handler("generate_chapter_draft_ui")
+    finalize_chapter_ui = _lazy_handler("finalize_chapter_ui")
+    do_consistency_check = _lazy_handler("do_consistency_check")
+    import_knowledge_handler = _lazy_handler("import_knowledge_handler")
+    clear_vectorstore_handler = _lazy_handler("clear_vectorstore_handler")
+    show_plot_arcs_ui = _lazy_handler("show_plot_arcs_ui")
     load_config_btn = load_config_btn
     save_config_btn = save_config_btn
     load_novel_architecture = load_novel_architecture